@@ -0,0 +1 @@
+# This file makes the 'loadtest' directory a Python package.
@@ -0,0 +1,22 @@
+import argparse
+import sys
+import os
+import uvicorn
+
+# Añadimos el directorio 'src' al path de Python para que encuentre el módulo 'language_tutor'
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from language_tutor.api import app
+from .stats import LatencyRecorder, install_stats
+
+# Lanza la API real del tutor con un middleware que mide cada endpoint, para que
+# el orquestador pueda desglosar la latencia por endpoint de la API.
+
+recorder = LatencyRecorder()
+install_stats(app, recorder)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="API del tutor instrumentada para pruebas de carga.")
+    parser.add_argument("--port", type=int, default=8100)
+    args = parser.parse_args()
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
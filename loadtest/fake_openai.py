@@ -0,0 +1,119 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import time
+import uuid
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+from .stats import LatencyRecorder, install_stats
+
+# Servidor que imita los endpoints de OpenAI que usa el tutor (chat, Whisper y TTS)
+# con latencias log-normales. Las medianas se escalan con FAKE_OPENAI_LATENCY_SCALE
+# (--latency-scale en el orquestador) o se fijan con FAKE_OPENAI_<ENDPOINT>_MEDIAN.
+
+LATENCY_PROFILES = {
+    # endpoint: (mediana en segundos, sigma de la log-normal)
+    "chat": (1.2, 0.5),
+    "transcription": (0.8, 0.4),
+    "speech": (1.5, 0.4),
+}
+
+# Bytes de audio aproximados por carácter de texto sintetizado, según el formato
+SPEECH_BYTES_PER_CHAR = {"mp3": 2000, "opus": 400, "aac": 1500, "flac": 8000, "wav": 16000}
+
+SAMPLE_TRANSCRIPTIONS = [
+    "Yesterday I go to the store and buyed apple.",
+    "I like play football with my friends on weekends.",
+    "My sister is more tall than me.",
+    "I have been living in Madrid since three years.",
+    "Today the weather is very nice and I am happy.",
+]
+
+app = FastAPI(title="Fake OpenAI API")
+recorder = LatencyRecorder()
+install_stats(app, recorder)
+latency_scale = float(os.environ.get("FAKE_OPENAI_LATENCY_SCALE", "1.0"))
+
+async def simulate_latency(endpoint: str) -> None:
+    median, sigma = LATENCY_PROFILES[endpoint]
+    median = float(os.environ.get(f"FAKE_OPENAI_{endpoint.upper()}_MEDIAN", median))
+    await asyncio.sleep(random.lognormvariate(math.log(median * latency_scale), sigma))
+
+def chat_completion(content: str | None = None, tool_call: dict | None = None, model: str = "gpt-4o-mini") -> dict:
+    message = {"role": "assistant", "content": content}
+    if tool_call:
+        message["tool_calls"] = [tool_call]
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if tool_call else "stop"}],
+        "usage": {"prompt_tokens": 200, "completion_tokens": 40, "total_tokens": 240},
+    }
+
+def reply_for(messages: list[dict]) -> tuple[str | None, dict | None]:
+    """
+    Decide la respuesta según el rol del agente (su mensaje de sistema), imitando
+    lo que haría el modelo real para que la conversación de autogen termine igual.
+    """
+    system = next((m.get("content") or "" for m in messages if m.get("role") == "system"), "")
+    transcript = next((m.get("content") for m in reversed(messages) if m.get("role") == "tool"), None)
+    transcript = transcript or random.choice(SAMPLE_TRANSCRIPTIONS)
+
+    if "transcription specialist" in system:
+        if any(m.get("role") == "tool" for m in messages):
+            return transcript, None
+        text = " ".join(m.get("content") or "" for m in messages)
+        path_match = re.search(r"'([^']+\.\w+)'", text)
+        file_path = path_match.group(1) if path_match else "voice_message.ogg"
+        return None, {
+            "id": f"call_{uuid.uuid4().hex[:24]}",
+            "type": "function",
+            "function": {"name": "transcribe_audio", "arguments": json.dumps({"file_path": file_path})},
+        }
+    if "grammar proofreader" in system:
+        return transcript.replace("go ", "went ").replace("buyed apple", "bought an apple"), None
+    if "structured feedback report" in system:
+        # Aproximadamente un 30% de los mensajes no tienen errores y siguen el flujo corto del bot.
+        if random.random() < 0.3:
+            return f'Original: "{transcript}"\nTERMINATE', None
+        corrected = transcript.replace("go ", "went ").replace("buyed apple", "bought an apple")
+        return (f'Original: "{transcript}"\n\nCorregido: "{corrected}"\n\n'
+                f'Tip: Usa el pasado simple para acciones terminadas.\nTERMINATE'), None
+    if "language practice partner" in system:
+        return "That sounds great! What did you do after that? TERMINATE", None
+    return "OK", None
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    await simulate_latency("chat")
+    content, tool_call = reply_for(body.get("messages", []))
+    return JSONResponse(chat_completion(content, tool_call, body.get("model", "gpt-4o-mini")))
+
+@app.post("/v1/audio/transcriptions")
+async def transcriptions(request: Request):
+    await request.form()
+    await simulate_latency("transcription")
+    return {"text": random.choice(SAMPLE_TRANSCRIPTIONS)}
+
+@app.post("/v1/audio/speech")
+async def speech(request: Request):
+    body = await request.json()
+    await simulate_latency("speech")
+    response_format = body.get("response_format", "mp3")
+    media_types = {"mp3": "audio/mpeg", "opus": "audio/ogg", "aac": "audio/aac", "flac": "audio/flac", "wav": "audio/wav"}
+    return Response(os.urandom(len(body.get("input", "")) * SPEECH_BYTES_PER_CHAR.get(response_format, 2000)),
+                    media_type=media_types.get(response_format, "application/octet-stream"))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor falso de OpenAI para pruebas de carga.")
+    parser.add_argument("--port", type=int, default=8102)
+    args = parser.parse_args()
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
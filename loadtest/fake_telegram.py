@@ -0,0 +1,75 @@
+import argparse
+import itertools
+import os
+import time
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import Response
+from .stats import LatencyRecorder, install_stats
+
+# Servidor que imita el subconjunto de la Bot API de Telegram que usa el bot:
+# getMe, getFile, la descarga de archivos y los métodos send*. Las rutas siguen el
+# formato de la API real (/bot<token>/<método> y /file/bot<token>/<ruta>) para que
+# python-telegram-bot funcione sin cambios apuntando su base_url aquí.
+
+# Tamaño de la nota de voz simulada (~10 s de OGG/Opus a 16 kbps)
+VOICE_NOTE_BYTES = int(os.environ.get("FAKE_TELEGRAM_VOICE_BYTES", "20000"))
+
+app = FastAPI(title="Fake Telegram Bot API")
+recorder = LatencyRecorder()
+message_ids = itertools.count(1)
+
+def endpoint_name(request: Request) -> str:
+    # Agrupamos por método de la API, sin el token ni la ruta del archivo.
+    if request.url.path.startswith("/file/"):
+        return "download_file"
+    return request.url.path.rsplit("/", 1)[-1]
+
+install_stats(app, recorder, name_for=endpoint_name)
+
+def ok(result) -> dict:
+    return {"ok": True, "result": result}
+
+@app.post("/bot{token}/getMe")
+async def get_me(token: str):
+    return ok({"id": 1, "is_bot": True, "first_name": "Tutoria", "username": "tutoria_loadtest_bot"})
+
+@app.post("/bot{token}/getFile")
+async def get_file(token: str, request: Request):
+    form = await request.form()
+    file_id = form.get("file_id", "voice")
+    return ok({
+        "file_id": file_id,
+        "file_unique_id": f"u-{file_id}",
+        "file_size": VOICE_NOTE_BYTES,
+        "file_path": f"voice/{file_id}.oga",
+    })
+
+@app.get("/file/bot{token}/{file_path:path}")
+async def download_file(token: str, file_path: str):
+    return Response(os.urandom(VOICE_NOTE_BYTES), media_type="audio/ogg")
+
+@app.post("/bot{token}/{method}")
+async def send(token: str, method: str, request: Request):
+    """
+    Acepta sendMessage, sendPhoto, sendVoice, etc. y devuelve un Message mínimo.
+    Cuenta los mensajes de error del bot para el informe.
+    """
+    form = await request.form()
+    text = form.get("text")
+    if isinstance(text, str) and (text.startswith("Error") or text.startswith("Lo siento")):
+        recorder.increment("bot_error_replies")
+    recorder.increment(method)
+    chat_id = int(form.get("chat_id", 0))
+    return ok({
+        "message_id": next(message_ids),
+        "date": int(time.time()),
+        "chat": {"id": chat_id, "type": "private"},
+        "text": text if isinstance(text, str) else None,
+    })
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor falso de la Bot API de Telegram para pruebas de carga.")
+    parser.add_argument("--port", type=int, default=8101)
+    args = parser.parse_args()
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
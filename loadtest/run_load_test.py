@@ -0,0 +1,234 @@
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import time
+import httpx
+
+# Añadimos el directorio 'src' al path de Python para que encuentre el módulo 'language_tutor'
+ROOT_DIR = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, os.path.join(ROOT_DIR, 'src'))
+sys.path.insert(0, ROOT_DIR)
+
+from .stats import summarize
+
+# Prueba de carga de extremo a extremo del bot y la API.
+#
+# Levanta tres procesos: un OpenAI falso con latencias realistas, una Bot API de
+# Telegram falsa y la API real del tutor (apuntando al OpenAI falso). En este
+# proceso se ejecuta la Application de python-telegram-bot con el handler real
+# 'handle_voice_message'; las actualizaciones se encolan en 'update_queue' igual
+# que haría run_polling o run_webhook, con la misma concurrencia que el bot real.
+# La latencia de cada nota se mide hasta que termina su turno en 'process_voice_turn'.
+# Los turnos en paralelo los limita ChatTurnScheduler (--max-in-flight); con
+# --max-in-flight 1 se ve la saturación de un bot que procesa los turnos en serie.
+#
+# Uso, desde la raíz del repositorio:
+#     python -m loadtest.run_load_test --levels 1,2,4,8 --messages-per-chat 2
+#     python -m loadtest.run_load_test --levels 1,2,4,8 --max-in-flight 1
+
+FAKE_TOKEN = "123456:LOADTEST"
+
+# Futuros pendientes por message_id, resueltos cuando termina el turno de la nota de voz.
+pending: dict[int, asyncio.Future] = {}
+
+def start_server(module: str, port: int, env: dict) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, "-m", f"loadtest.{module}", "--port", str(port)], cwd=ROOT_DIR, env=env)
+
+async def wait_until_ready(client: httpx.AsyncClient, url: str, timeout: float = 120.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get(url)).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError(f"El servidor no respondió a tiempo: {url}")
+
+def voice_update(update_id: int, chat_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": f"Learner {chat_id}"},
+            "voice": {
+                "file_id": f"voice-{update_id}",
+                "file_unique_id": f"uvoice-{update_id}",
+                "duration": 10,
+                "mime_type": "audio/ogg",
+            },
+        },
+    }
+
+def track_completion(process_turn):
+    """Envuelve el procesamiento real de un turno para marcar cuándo termina cada nota de voz."""
+    async def tracked(messages) -> None:
+        try:
+            await process_turn(messages)
+        finally:
+            for message in messages:
+                future = pending.pop(message.message_id, None)
+                if future and not future.done():
+                    future.set_result(time.perf_counter())
+    return tracked
+
+async def simulate_chat(application, chat_id: int, messages: int, think_time: float,
+                        update_ids, latencies: list[float]) -> None:
+    """
+    Un chat envía 'messages' notas de voz, esperando la respuesta completa de cada
+    una y un tiempo de reflexión exponencial antes de la siguiente.
+    """
+    from telegram import Update
+    loop = asyncio.get_running_loop()
+    for _ in range(messages):
+        update_id = next(update_ids)
+        done = loop.create_future()
+        pending[update_id] = done  # En las actualizaciones simuladas message_id == update_id
+        started = time.perf_counter()
+        await application.update_queue.put(Update.de_json(voice_update(update_id, chat_id), application.bot))
+        finished = await done
+        latencies.append(finished - started)
+        if think_time > 0:
+            await asyncio.sleep(random.expovariate(1 / think_time))
+
+async def run_level(application, client: httpx.AsyncClient, servers: dict, concurrency: int,
+                    messages: int, think_time: float, update_ids) -> dict:
+    for base_url in servers.values():
+        await client.post(f"{base_url}/__stats/reset")
+
+    latencies = []
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        simulate_chat(application, 1000 + chat, messages, think_time, update_ids, latencies)
+        for chat in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - started
+
+    breakdown = {}
+    for name, base_url in servers.items():
+        breakdown[name] = (await client.get(f"{base_url}/__stats")).json()
+
+    return {
+        "concurrency": concurrency,
+        "messages": len(latencies),
+        "elapsed": elapsed,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "end_to_end": summarize(latencies),
+        "servers": breakdown,
+    }
+
+def print_report(result: dict) -> None:
+    e2e = result["end_to_end"]
+    errors = result["servers"]["telegram"]["counters"].get("bot_error_replies", 0)
+    print(f"\n== Concurrencia {result['concurrency']}: {result['messages']} mensajes en {result['elapsed']:.1f}s ==")
+    print(f"Throughput: {result['throughput']:.3f} msg/s   Respuestas de error del bot: {errors}")
+    print(f"Extremo a extremo: p50 {e2e['p50']:.2f}s  p95 {e2e['p95']:.2f}s  p99 {e2e['p99']:.2f}s")
+    print(f"{'Endpoint':<45}{'n':>6}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for server, stats in result["servers"].items():
+        for name, summary in sorted(stats["endpoints"].items()):
+            print(f"{server + ' ' + name:<45}{summary['count']:>6}"
+                  f"{summary['p50']:>8.2f}s{summary['p95']:>8.2f}s{summary['p99']:>8.2f}s")
+
+async def run(args) -> list[dict]:
+    ports = {"api": args.api_port, "telegram": args.telegram_port, "openai": args.openai_port}
+    servers = {name: f"http://127.0.0.1:{port}" for name, port in ports.items()}
+
+    stub_env = {**os.environ, "FAKE_OPENAI_LATENCY_SCALE": str(args.latency_scale)}
+    api_env = {
+        **os.environ,
+        "LLM_PROVIDER": "openai",
+        "OPENAI_API_KEY": "sk-loadtest",
+        "OPENAI_BASE_URL": f"{servers['openai']}/v1",
+    }
+    processes = [
+        start_server("fake_openai", ports["openai"], stub_env),
+        start_server("fake_telegram", ports["telegram"], stub_env),
+        start_server("api_server", ports["api"], api_env),
+    ]
+
+    # El bot lee la URL de la API de la configuración al importarse.
+    os.environ["API_BASE_URL"] = servers["api"]
+    from telegram.ext import Application, MessageHandler, filters
+    import telegram_bot
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("telegram_bot").setLevel(logging.WARNING)
+
+    results = []
+    try:
+        async with httpx.AsyncClient(timeout=30.0) as client:
+            await wait_until_ready(client, f"{servers['openai']}/__stats")
+            await wait_until_ready(client, f"{servers['telegram']}/__stats")
+            await wait_until_ready(client, f"{servers['api']}/ready")
+
+            builder = (Application.builder().token(FAKE_TOKEN)
+                       .base_url(f"{servers['telegram']}/bot")
+                       .base_file_url(f"{servers['telegram']}/file/bot"))
+            concurrent_updates = args.concurrent_updates
+            if concurrent_updates is None:
+                concurrent_updates = telegram_bot.settings.BOT_CONCURRENT_UPDATES
+            application = (builder.concurrent_updates(max(concurrent_updates, 1))
+                           .connection_pool_size(telegram_bot.settings.BOT_CONNECTION_POOL_SIZE)
+                           .build())
+            application.add_handler(MessageHandler(filters.VOICE, telegram_bot.handle_voice_message))
+            scheduler = telegram_bot.create_scheduler(args.max_in_flight)
+            scheduler.process_turn = track_completion(scheduler.process_turn)
+            application.bot_data["scheduler"] = scheduler
+
+            await application.initialize()
+            await application.start()
+            try:
+                update_ids = itertools.count(1)
+                for concurrency in args.levels:
+                    result = await run_level(application, client, servers, concurrency,
+                                             args.messages_per_chat, args.think_time, update_ids)
+                    print_report(result)
+                    results.append(result)
+            finally:
+                # Mismo orden que run_polling: stop, post_stop, shutdown y post_shutdown.
+                await application.stop()
+                await telegram_bot.drain_scheduler(application)
+                await application.shutdown()
+                await telegram_bot.close_api_client(application)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+    return results
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Prueba de carga del bot de Telegram y la API del tutor.")
+    parser.add_argument("--levels", type=lambda s: [int(x) for x in s.split(",")], default=[1, 2, 4, 8],
+                        help="Niveles de concurrencia (chats simultáneos), separados por comas.")
+    parser.add_argument("--messages-per-chat", type=int, default=2)
+    parser.add_argument("--think-time", type=float, default=2.0,
+                        help="Media en segundos del tiempo entre la respuesta y la siguiente nota de voz.")
+    parser.add_argument("--latency-scale", type=float, default=1.0,
+                        help="Multiplicador de las latencias simuladas de OpenAI.")
+    parser.add_argument("--concurrent-updates", type=int, default=None,
+                        help="Handlers ejecutados en paralelo por el bot; solo afecta al acuse de recibo. "
+                             "Por defecto, BOT_CONCURRENT_UPDATES de la configuración.")
+    parser.add_argument("--max-in-flight", type=int, default=None,
+                        help="Turnos de voz procesados en paralelo (1 = secuencial). "
+                             "Por defecto, BOT_MAX_IN_FLIGHT de la configuración.")
+    parser.add_argument("--api-port", type=int, default=8100)
+    parser.add_argument("--telegram-port", type=int, default=8101)
+    parser.add_argument("--openai-port", type=int, default=8102)
+    parser.add_argument("--json", dest="json_path", help="Guarda los resultados en este archivo JSON.")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
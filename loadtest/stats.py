@@ -0,0 +1,82 @@
+import math
+import threading
+import time
+from collections import defaultdict
+from fastapi import FastAPI, Request
+
+def percentile(values: list[float], p: float) -> float:
+    """
+    Percentil por rango más cercano. Devuelve 0.0 si no hay valores.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(p / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def summarize(values: list[float]) -> dict:
+    """Resume una lista de latencias (en segundos) con su número y percentiles."""
+    return {
+        "count": len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+    }
+
+class LatencyRecorder:
+    """
+    Acumula latencias por nombre de endpoint y contadores sueltos, de forma segura
+    entre hilos, para exponerlos en el endpoint /__stats de cada servidor.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latencies = defaultdict(list)
+        self._counters = defaultdict(int)
+
+    def record(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self._latencies[name].append(seconds)
+
+    def increment(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "endpoints": {name: summarize(values) for name, values in self._latencies.items()},
+                "counters": dict(self._counters),
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._latencies.clear()
+            self._counters.clear()
+
+def install_stats(app: FastAPI, recorder: LatencyRecorder, name_for=None) -> None:
+    """
+    Añade a la aplicación un middleware que mide cada petición y los endpoints
+    GET /__stats y POST /__stats/reset para consultarlas desde el orquestador.
+
+    :param name_for: Función opcional que recibe la petición y devuelve el nombre con el
+                     que se agrupa; por defecto "MÉTODO /ruta".
+    """
+    @app.middleware("http")
+    async def measure(request: Request, call_next):
+        if request.url.path.startswith("/__stats"):
+            return await call_next(request)
+        start = time.perf_counter()
+        try:
+            return await call_next(request)
+        finally:
+            name = name_for(request) if name_for else f"{request.method} {request.url.path}"
+            recorder.record(name, time.perf_counter() - start)
+
+    @app.get("/__stats")
+    async def stats():
+        return recorder.snapshot()
+
+    @app.post("/__stats/reset")
+    async def reset_stats():
+        recorder.reset()
+        return {"status": "ok"}
@@ -1,3 +1,4 @@
+import argparse
 import uvicorn
 import sys
 import os
@@ -6,17 +7,89 @@ import os
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
+APP_PATH = "language_tutor.api:app"
+
+def run_development(host: str, port: int) -> None:
+    """
+    Lanza un único proceso con recarga automática, ideal para desarrollo.
+    """
+    uvicorn.run(APP_PATH, host=host, port=port, reload=True, reload_dirs=["src"])
+
+def run_production(host: str, port: int, workers: int, preload: bool) -> None:
+    """
+    Lanza varios procesos worker sin recarga automática.
+
+    Con 'preload', la configuración, las fuentes y las dependencias pesadas se
+    cargan una vez en el proceso maestro y los workers las heredan al hacer fork
+    (copy-on-write), lo que reduce el arranque en frío y la memoria por worker.
+    Esto requiere gunicorn.
+
+    Sin 'preload' (o sin gunicorn) no hay ahorro de memoria: cada worker acepta
+    conexiones enseguida, pero al arrancar lanza su propio calentamiento en segundo
+    plano, que importa autogen y openai, y lo indica en el endpoint /ready.
+    """
+    if preload:
+        try:
+            from gunicorn.app.base import BaseApplication
+        except ImportError:
+            print("Warning: gunicorn no está instalado, se arranca sin precarga (pip install gunicorn).")
+        else:
+            from language_tutor.warmup import warmup
+            from language_tutor.api import app
+
+            warmup()
+
+            class PreforkApplication(BaseApplication):
+                def __init__(self, application, options: dict):
+                    self.application = application
+                    self.options = options
+                    super().__init__()
+
+                def load_config(self):
+                    for key, value in self.options.items():
+                        self.cfg.set(key, value)
+
+                def load(self):
+                    return self.application
+
+            options = {
+                "bind": f"{host}:{port}",
+                "workers": workers,
+                "worker_class": "uvicorn.workers.UvicornWorker",
+                "preload_app": True,
+            }
+            PreforkApplication(app, options).run()
+            return
+
+    uvicorn.run(APP_PATH, host=host, port=port, workers=workers)
+
 if __name__ == "__main__":
     """
     Punto de entrada para lanzar el servidor de la API.
-    
-    Este script inicia un servidor Uvicorn que sirve la aplicación FastAPI
+
+    Este script inicia un servidor que sirve la aplicación FastAPI
     definida en 'language_tutor.api:app'.
-    
-    - app: La ruta de importación al objeto de la aplicación FastAPI.
+
+    - Por defecto (desarrollo): un solo proceso Uvicorn con recarga automática
+      al detectar cambios en el código.
+    - Con --prod: varios workers (API_WORKERS en el .env o --workers) y,
+      opcionalmente, precarga antes del fork (API_PRELOAD o --preload). Solo
+      con precarga se comparte la memoria de las dependencias entre workers.
     - host: "0.0.0.0" para que sea accesible desde la red local.
     - port: El puerto en el que se ejecutará el servidor.
-    - reload: True para que el servidor se reinicie automáticamente al detectar
-      cambios en el código, ideal para desarrollo.
     """
-    uvicorn.run("language_tutor.api:app", host="0.0.0.0", port=8000, reload=True, reload_dirs=["src"])
\ No newline at end of file
+    from language_tutor.config import settings
+
+    parser = argparse.ArgumentParser(description="Servidor de la API del tutor de idiomas.")
+    parser.add_argument("--prod", action="store_true", help="Modo producción: varios workers y sin recarga.")
+    parser.add_argument("--host", default=settings.API_HOST)
+    parser.add_argument("--port", type=int, default=settings.API_PORT)
+    parser.add_argument("--workers", type=int, default=settings.API_WORKERS)
+    parser.add_argument("--preload", action=argparse.BooleanOptionalAction, default=settings.API_PRELOAD,
+                        help="Precarga configuración, fuentes y dependencias antes del fork (requiere gunicorn).")
+    args = parser.parse_args()
+
+    if args.prod:
+        run_production(args.host, args.port, args.workers, args.preload)
+    else:
+        run_development(args.host, args.port)
@@ -1,6 +1,5 @@
 import autogen
-import json
-import os
+from ..configs import load_config
 
 def create_assistant_agent(llm_config: dict, role_name: str) -> autogen.AssistantAgent:
     """
@@ -13,11 +12,8 @@ def create_assistant_agent(llm_config: dict, role_name: str) -> autogen.Assistan
     Returns:
         Una instancia de autogen.AssistantAgent.
     """
-    # Construir la ruta al archivo de configuración de roles
-    config_path = os.path.join(os.path.dirname(__file__), '..', 'configs', 'agent_roles.json')
-    
-    with open(config_path, 'r', encoding='utf-8') as f:
-        roles = json.load(f)
+    # Los roles se leen del disco una sola vez por proceso
+    roles = load_config('agent_roles.json')
     
     agent_config = roles.get(role_name, roles["Default"])
 
@@ -1,81 +1,215 @@
+import asyncio
 import os
 import shutil
 import uuid
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form, BackgroundTasks
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, BackgroundTasks, Header
 from fastapi.responses import FileResponse
 from fastapi.concurrency import run_in_threadpool
-from .main import run_team_conversation_and_get_text_response
-from .tools.language_tools import text_to_speech
-from .tools.image_tools import text_to_image, text_to_simple_image
+from .warmup import warmup, is_ready, warmup_error
+from .tools.text_alignment import analyze_feedback
+from .tools.formats import IMAGE_FORMATS, SPEECH_FORMATS
+
+# Las dependencias pesadas (autogen, openai, Pillow) se importan dentro de estas funciones,
+# que se ejecutan con run_in_threadpool: si el calentamiento aún está importando autogen u
+# openai, el bloqueo de importación retiene un hilo del pool y no el bucle de eventos,
+# así que /health y /ready siguen respondiendo.
+
+def _run_team(**kwargs):
+    from .main import run_team_conversation_and_get_text_response
+    return run_team_conversation_and_get_text_response(**kwargs)
+
+def _transcribe_audio(file_path: str):
+    from .tools.language_tools import transcribe_audio
+    return transcribe_audio(file_path)
+
+def _text_to_speech(text: str, response_format: str):
+    from .tools.language_tools import text_to_speech
+    return text_to_speech(text, response_format)
+
+def _text_to_image(text: str, output_path: str, image_format: str, quality: int):
+    from .tools.image_tools import text_to_image
+    return text_to_image(text, output_path, image_format, quality)
+
+def _text_to_simple_image(text: str, output_path: str, image_format: str, quality: int):
+    from .tools.image_tools import text_to_simple_image
+    return text_to_simple_image(text, output_path, image_format, quality)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Lanza el calentamiento en segundo plano si el proceso no viene ya precargado.
+    """
+    if not is_ready():
+        # Guardamos la referencia para que la tarea no sea recolectada.
+        app.state.warmup_task = asyncio.create_task(run_in_threadpool(warmup))
+    yield
 
 app = FastAPI(
     title="Language Tutor Agent Service",
     description="An API to interact with a team of language learning agents.",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 UPLOADS_DIR = "data/.uploads"
 os.makedirs(UPLOADS_DIR, exist_ok=True)
 
+@app.get("/health")
+async def health():
+    """
+    Endpoint de vida: responde en cuanto el proceso acepta conexiones.
+    """
+    return {"status": "ok"}
+
+@app.get("/ready")
+async def ready():
+    """
+    Endpoint de disponibilidad: responde 503 hasta que termina el calentamiento.
+    """
+    if not is_ready():
+        error = warmup_error()
+        detail = f"Warmup failed: {error}" if error else "Warmup in progress."
+        raise HTTPException(status_code=503, detail=detail)
+    return {"status": "ready"}
+
 @app.post("/process-audio/")
 async def process_audio_to_text(
     team_name: str = Form("feedback_and_conversation_team"), # Usamos el equipo que da feedback y continúa la conversación
-    file: UploadFile = File(...)
+    file: list[UploadFile] = File(...)
 ):
     """
     Endpoint para subir un archivo de audio, procesarlo con agentes y devolver una respuesta de texto.
-    """
-    # Genera un nombre de archivo único para el audio de entrada
-    file_extension = os.path.splitext(file.filename)[1] or ".ogg"
-    temp_filename = f"{uuid.uuid4()}{file_extension}"
-    input_path = os.path.join(UPLOADS_DIR, temp_filename)
 
-    # Guarda el archivo subido en el servidor
-    with open(input_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    - Un solo archivo en el campo 'file': comportamiento de siempre, el agente Audio_Transcriber
+      del equipo transcribe el audio.
+    - Varios archivos en el campo 'file' (notas de voz seguidas de un mismo turno): cada uno se
+      transcribe por separado con Whisper, los textos se unen en un solo mensaje y el equipo se
+      ejecuta sin Audio_Transcriber. Si falla alguna transcripción se devuelve un 500 con el error.
 
-    user_request = f"""Start a conversation based on the following audio file: '{input_path}'.
-Listen to what I say and respond naturally in the same language.
+    La respuesta incluye 'response' y, si es un feedback, 'corrections' (ver analyze_feedback).
     """
-    
+    # Guarda los archivos subidos en el servidor con un nombre único
+    input_paths = []
+    for upload in file:
+        file_extension = os.path.splitext(upload.filename)[1] or ".ogg"
+        input_path = os.path.join(UPLOADS_DIR, f"{uuid.uuid4()}{file_extension}")
+        with open(input_path, "wb") as buffer:
+            shutil.copyfileobj(upload.file, buffer)
+        input_paths.append(input_path)
+
     try:
+        if len(input_paths) == 1:
+            user_request = f"""Start a conversation based on the following audio file: '{input_paths[0]}'.
+Listen to what I say and respond naturally in the same language.
+    """
+        else:
+            # No se concatenan los audios: muchos decodificadores se detienen en el
+            # segundo flujo de un OGG encadenado, así que se transcribe cada nota.
+            texts = await asyncio.gather(*(run_in_threadpool(_transcribe_audio, path) for path in input_paths))
+            failed = next((text for text in texts if text.startswith("Error")), None)
+            if failed:
+                raise HTTPException(status_code=500, detail=failed)
+            user_request = f"""I sent several voice messages in a row. This is their transcription: "{' '.join(texts)}".
+Respond naturally in the same language.
+    """
+
         # Usamos run_in_threadpool para ejecutar el código síncrono de los agentes
         # sin bloquear el bucle de eventos de FastAPI.
-        text_response = await run_in_threadpool(run_team_conversation_and_get_text_response, team_name=team_name, user_request=user_request)
+        text_response = await run_in_threadpool(_run_team, team_name=team_name, user_request=user_request, audio_transcribed=len(input_paths) > 1)
         
         if text_response:
-            return {"response": text_response}
+            result = {"response": text_response}
+            # Si la respuesta es un feedback, adjuntamos la alineación palabra por palabra
+            corrections = analyze_feedback(text_response)
+            if corrections is not None:
+                result["corrections"] = corrections
+            return result
         else:
             raise HTTPException(status_code=500, detail="Agent process finished but no text response was generated.")
+    except HTTPException:
+        # Los errores ya preparados para el cliente se devuelven tal cual, sin volver a envolverlos
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred during agent processing: {e}")
     finally:
-        # Limpieza del archivo de entrada
-        if os.path.exists(input_path):
-            os.remove(input_path)
-            print(f"Cleaned up temporary input file: {input_path}")
+        # Limpieza de los archivos de entrada
+        for input_path in input_paths:
+            if os.path.exists(input_path):
+                os.remove(input_path)
+                print(f"Cleaned up temporary input file: {input_path}")
+
+def negotiate_speech_format(text_input: dict, accept: str | None) -> str:
+    """
+    Elige el formato de audio de la respuesta.
+
+    Tiene prioridad el campo "format" del cuerpo ("mp3", "opus", "aac", "flac" o "wav").
+    Si no viene, se usa la cabecera Accept por orden de preferencia (q); "audio/ogg" y
+    "audio/opus" eligen OGG/Opus. Sin coincidencias se devuelve MP3.
+    """
+    requested = text_input.get("format")
+    if requested is not None:
+        # Se comprueba el tipo antes de buscar en el diccionario: una lista u objeto JSON no es hashable.
+        if not isinstance(requested, str) or requested not in SPEECH_FORMATS:
+            raise HTTPException(status_code=400, detail=f"Unsupported audio format '{requested}'. Options: {', '.join(SPEECH_FORMATS)}.")
+        return requested
+
+    media_types = {media_type: name for name, (media_type, _) in SPEECH_FORMATS.items()}
+    media_types["audio/opus"] = "opus"
+    candidates = []
+    for position, item in enumerate((accept or "").split(",")):
+        media_type, *params = [part.strip() for part in item.split(";")]
+        quality = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if media_type in media_types and quality > 0:
+            candidates.append((-quality, position, media_types[media_type]))
+    return min(candidates)[2] if candidates else "mp3"
 
 @app.post("/synthesize-speech/")
 async def synthesize_speech(
     text_input: dict,
-    background_tasks: BackgroundTasks
+    background_tasks: BackgroundTasks,
+    accept: str | None = Header(None)
 ):
     """
     Endpoint para convertir texto a voz.
-    Recibe un JSON con texto y devuelve un archivo de audio.
+    Recibe un JSON con texto y devuelve un archivo de audio en el formato negociado
+    (ver negotiate_speech_format), p. ej. OGG/Opus para las notas de voz de Telegram.
     """
     text = text_input.get("text")
     if not text:
         raise HTTPException(status_code=400, detail="No text provided for synthesis.")
+    response_format = negotiate_speech_format(text_input, accept)
 
-    output_path = text_to_speech(text)
+    output_path = await run_in_threadpool(_text_to_speech, text, response_format)
 
     if output_path and os.path.exists(output_path):
         background_tasks.add_task(os.remove, output_path)
-        return FileResponse(path=output_path, media_type="audio/mpeg", filename=os.path.basename(output_path), background=background_tasks)
+        return FileResponse(path=output_path, media_type=SPEECH_FORMATS[response_format][0], filename=os.path.basename(output_path), background=background_tasks)
     else:
         raise HTTPException(status_code=500, detail="Failed to generate speech file.")
 
+def get_image_output_options(text_input: dict) -> tuple[str, int]:
+    """
+    Lee y valida las opciones de salida de imagen del cuerpo de la petición.
+
+    - format: "png" (por defecto), "png-palette", "webp" o "jpeg".
+    - quality: 1-100 para "webp" y "jpeg" (85 por defecto).
+    """
+    image_format = text_input.get("format", "png")
+    if not isinstance(image_format, str) or image_format not in IMAGE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported image format '{image_format}'. Options: {', '.join(IMAGE_FORMATS)}.")
+    quality = text_input.get("quality", 85)
+    # bool es subclase de int: un 'true' en el JSON no debe convertirse en calidad 1.
+    if isinstance(quality, bool) or not isinstance(quality, int) or not 1 <= quality <= 100:
+        raise HTTPException(status_code=400, detail="Image quality must be an integer between 1 and 100.")
+    return image_format, quality
+
 @app.post("/generate-image-from-text/")
 async def generate_image(
     text_input: dict,
@@ -87,16 +221,18 @@ async def generate_image(
     text = text_input.get("text")
     if not text:
         raise HTTPException(status_code=400, detail="No text provided for image generation.")
+    image_format, quality = get_image_output_options(text_input)
+    _, media_type, extension = IMAGE_FORMATS[image_format]
 
     # Definir una ruta de salida temporal para la imagen
-    output_filename = f"feedback_{uuid.uuid4()}.png"
+    output_filename = f"feedback_{uuid.uuid4()}{extension}"
     output_path = os.path.join(UPLOADS_DIR, output_filename)
 
     # Generar la imagen
-    generated_path = text_to_image(text, output_path)
+    generated_path = await run_in_threadpool(_text_to_image, text, output_path, image_format, quality)
     if generated_path and os.path.exists(generated_path):
         background_tasks.add_task(os.remove, generated_path)
-        return FileResponse(path=generated_path, media_type="image/png", filename=os.path.basename(generated_path), background=background_tasks)
+        return FileResponse(path=generated_path, media_type=media_type, filename=os.path.basename(generated_path), background=background_tasks)
     else:
         raise HTTPException(status_code=500, detail="Failed to generate image from text.")
 
@@ -111,15 +247,17 @@ async def generate_simple_image(
     text = text_input.get("text")
     if not text:
         raise HTTPException(status_code=400, detail="No text provided for image generation.")
+    image_format, quality = get_image_output_options(text_input)
+    _, media_type, extension = IMAGE_FORMATS[image_format]
 
     # Definir una ruta de salida temporal para la imagen
-    output_filename = f"response_{uuid.uuid4()}.png"
+    output_filename = f"response_{uuid.uuid4()}{extension}"
     output_path = os.path.join(UPLOADS_DIR, output_filename)
 
     # Generar la imagen
-    generated_path = text_to_simple_image(text, output_path)
+    generated_path = await run_in_threadpool(_text_to_simple_image, text, output_path, image_format, quality)
     if generated_path and os.path.exists(generated_path):
         background_tasks.add_task(os.remove, generated_path)
-        return FileResponse(path=generated_path, media_type="image/png", filename=os.path.basename(generated_path), background=background_tasks)
+        return FileResponse(path=generated_path, media_type=media_type, filename=os.path.basename(generated_path), background=background_tasks)
     else:
         raise HTTPException(status_code=500, detail="Failed to generate simple image from text.")
\ No newline at end of file
@@ -1,4 +1,5 @@
 import os
+from functools import lru_cache
 from dotenv import load_dotenv
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -23,15 +24,60 @@ class Settings(BaseSettings):
 
     # --- Configuración del Bot de Telegram ---
     TELEGRAM_TOKEN: str | None = None
+    # URL base de la API del tutor a la que llama el bot
+    API_BASE_URL: str = "http://127.0.0.1:8000"
+    # Formato de las imágenes que pide el bot ("png", "png-palette", "webp" o "jpeg")
+    BOT_IMAGE_FORMAT: str = "png-palette"
+    BOT_IMAGE_QUALITY: int = 85
+    # Formato del audio de las respuestas de voz: "opus" es el nativo de las notas de voz de Telegram
+    BOT_VOICE_FORMAT: str = "opus"
+    # Turnos de voz en curso por chat y en total, y ventana (en segundos) para unir
+    # notas de voz seguidas de un mismo chat en un solo turno (0 = no se unen; desactivado
+    # por defecto hasta validar con tráfico real la transcripción de turnos unidos)
+    BOT_MAX_IN_FLIGHT_PER_CHAT: int = 1
+    BOT_MAX_IN_FLIGHT: int = 8
+    BOT_MERGE_WINDOW_SECONDS: float = 0.0
+    # Handlers de Telegram ejecutados en paralelo (el de voz solo encola la nota y responde
+    # "Recibido"; los turnos los limita BOT_MAX_IN_FLIGHT) y tamaño del pool de conexiones del bot
+    BOT_CONCURRENT_UPDATES: int = 16
+    BOT_CONNECTION_POOL_SIZE: int = 32
+    # Modo del bot: "polling" o "webhook" (detrás de un proxy inverso local con HTTPS)
+    BOT_MODE: str = "polling"
+    BOT_WEBHOOK_URL: str | None = None      # URL pública completa, p. ej. https://midominio.com/telegram
+    BOT_WEBHOOK_LISTEN: str = "127.0.0.1"
+    BOT_WEBHOOK_PORT: int = 8081
+    BOT_WEBHOOK_PATH: str = "telegram"
+    BOT_WEBHOOK_SECRET: str | None = None   # Se comprueba en la cabecera X-Telegram-Bot-Api-Secret-Token
 
-# 2. Crea una instancia única para ser usada en toda la aplicación
-settings = Settings()
+    # --- Configuración del servidor de la API (modo producción) ---
+    API_HOST: str = "0.0.0.0"
+    API_PORT: int = 8000
+    API_WORKERS: int = 2
+    # Si es True, la configuración, las fuentes y las dependencias pesadas se cargan
+    # una sola vez en el proceso maestro antes de crear los workers (requiere gunicorn).
+    API_PRELOAD: bool = False
+
+# 2. La instancia única se crea en el primer uso y no al importar el módulo,
+#    así los procesos que no la necesitan no pagan la lectura del .env.
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """
+    Devuelve la instancia única de configuración, creándola la primera vez.
+    """
+    return Settings()
+
+def __getattr__(name: str):
+    # Mantiene compatible `from language_tutor.config import settings`.
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def get_llm_config():
     """
     Carga la configuración del LLM para AutoGen basándose en el proveedor
     especificado en las variables de entorno.
     """
+    settings = get_settings()
     if settings.LLM_PROVIDER == "openai":
         if not settings.OPENAI_API_KEY:
             print("Error: LLM_PROVIDER es 'openai' pero OPENAI_API_KEY no está configurada en tu .env")
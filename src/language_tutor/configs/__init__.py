@@ -1 +1,17 @@
-# This file makes the 'configs' directory a Python sub-package.
\ No newline at end of file
+# This file makes the 'configs' directory a Python sub-package.
+import json
+import os
+from functools import lru_cache
+
+CONFIGS_DIR = os.path.dirname(__file__)
+
+@lru_cache(maxsize=None)
+def load_config(filename: str) -> dict:
+    """
+    Carga un archivo JSON de este directorio una sola vez por proceso.
+
+    :param filename: El nombre del archivo, p. ej. 'team_configs.json'.
+    :return: El contenido del archivo. No debe modificarse, se comparte entre llamadas.
+    """
+    with open(os.path.join(CONFIGS_DIR, filename), 'r', encoding='utf-8') as f:
+        return json.load(f)
@@ -1,11 +1,10 @@
 import autogen
-import json
-import os
 from language_tutor.config import get_llm_config, settings
+from language_tutor.configs import load_config
 from language_tutor.tools.language_tools import transcribe_audio, text_to_speech
 from language_tutor.agents.base_agents import create_assistant_agent
 
-def run_team_conversation_and_get_text_response(team_name: str, user_request: str) -> str | None:
+def run_team_conversation_and_get_text_response(team_name: str, user_request: str, audio_transcribed: bool = False) -> str | None:
     llm_config = get_llm_config()
     if not llm_config:
         print("Error: Could not load LLM configuration. Make sure your .env file is configured.")
@@ -16,9 +15,7 @@ def run_team_conversation_and_get_text_response(team_name: str, user_request: st
         print("Warning: Audio transcription requires LLM_PROVIDER='openai' in your .env to use Whisper.")
 
     # 3. Cargar la configuración del equipo y crear los agentes dinámicamente
-    config_path = os.path.join(os.path.dirname(__file__), 'configs', 'team_configs.json')
-    with open(config_path, 'r', encoding='utf-8') as f:
-        teams = json.load(f)
+    teams = load_config('team_configs.json')
     
     team_config = teams.get(team_name)
     if not team_config:
@@ -73,6 +70,9 @@ def run_team_conversation_and_get_text_response(team_name: str, user_request: st
     team_agents = [user_proxy]
     # Damos la config con herramientas solo a los agentes que las necesitan.
     for role_name in team_config["agent_roles"]:
+        # Si la petición ya trae el texto transcrito, el transcriptor sobra.
+        if audio_transcribed and role_name == "Audio_Transcriber":
+            continue
         if role_name in ["Audio_Transcriber", "Speech_Synthesizer"]:
             agent = create_assistant_agent(llm_config_with_tools, role_name)
         else:
@@ -0,0 +1,21 @@
+# Tablas de formatos de salida. Viven aparte de image_tools y language_tools para que
+# la API pueda validar las peticiones sin importar Pillow ni openai.
+
+# Formatos de salida disponibles: nombre -> (formato de Pillow, media type, extensión)
+IMAGE_FORMATS = {
+    "png": ("PNG", "image/png", ".png"),
+    "png-palette": ("PNG", "image/png", ".png"),  # PNG con paleta de 256 colores, mucho más ligero
+    "webp": ("WEBP", "image/webp", ".webp"),
+    "jpeg": ("JPEG", "image/jpeg", ".jpg"),
+}
+
+# Formatos de audio que devuelve la API de OpenAI: nombre -> (media type, extensión).
+# "opus" es OGG/Opus, el formato nativo de las notas de voz de Telegram, y pesa
+# varias veces menos que MP3 para voz; OpenAI lo genera directamente, sin transcodificar.
+SPEECH_FORMATS = {
+    "mp3": ("audio/mpeg", ".mp3"),
+    "opus": ("audio/ogg", ".ogg"),
+    "aac": ("audio/aac", ".aac"),
+    "flac": ("audio/flac", ".flac"),
+    "wav": ("audio/wav", ".wav"),
+}
@@ -2,14 +2,74 @@ import os
 from PIL import Image, ImageDraw, ImageFont
 import textwrap
 import re
-from difflib import ndiff
+from functools import lru_cache
+from .text_alignment import align_words, extract_sentences, KEEP, INSERT
+from .formats import IMAGE_FORMATS
 
-def text_to_image(text: str, output_path: str) -> str | None:
+@lru_cache(maxsize=1)
+def get_fonts() -> tuple:
+    """
+    Carga las fuentes regular y negrita una sola vez por proceso.
+
+    :return: Una tupla (font_regular, font_bold).
+    """
+    try:
+        # Intentar usar fuentes comunes en Linux (como en la Raspberry Pi)
+        font_regular = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", size=15)
+        font_bold = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", size=15)
+    except IOError:
+        try:
+            # Si falla, intentar con fuentes de Windows
+            font_regular = ImageFont.truetype("arial.ttf", size=15)
+            font_bold = ImageFont.truetype("arialbd.ttf", size=15)
+        except IOError:
+            # Como último recurso, usar la fuente por defecto (sin negritas)
+            print("Warning: Custom fonts not found. Falling back to default font.")
+            font_regular = ImageFont.load_default()
+            font_bold = ImageFont.load_default()
+    return font_regular, font_bold
+
+def save_image(img: Image.Image, output_path: str, image_format: str = "png", quality: int = 85) -> None:
+    """
+    Guarda una imagen RGB en el formato de salida pedido.
+
+    :param img: La imagen a guardar.
+    :param output_path: La ruta donde se guardará.
+    :param image_format: Una de las claves de IMAGE_FORMATS.
+    :param quality: Calidad (1-100) para WebP y JPEG; se ignora en PNG.
+    """
+    pil_format = IMAGE_FORMATS[image_format][0]
+    if image_format == "png-palette":
+        # Las imágenes son texto sobre pocos colores planos: una paleta apenas se nota.
+        img.quantize(colors=256, method=Image.Quantize.FASTOCTREE).save(output_path, format=pil_format, optimize=True)
+    elif pil_format in ("WEBP", "JPEG"):
+        img.save(output_path, format=pil_format, quality=quality)
+    else:
+        img.save(output_path, format=pil_format)
+
+@lru_cache(maxsize=8)
+def render_label_box(width: int, height: int, radius: int, bg_color: str, label: str, label_color: str) -> Image.Image:
+    """
+    Dibuja una caja redondeada con una etiqueta centrada. Se construye una sola vez
+    por proceso para cada combinación de parámetros y después solo se pega.
+    La imagen devuelta es compartida: no debe modificarse.
+    """
+    _, font_bold = get_fonts()
+    box = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(box)
+    draw.rounded_rectangle(((0, 0), (width, height)), radius=radius, fill=bg_color)
+    label_width = draw.textlength(label, font=font_bold)
+    draw.text(((width - label_width) / 2, (height - font_bold.getbbox(label)[3]) / 2), label, font=font_bold, fill=label_color)
+    return box
+
+def text_to_image(text: str, output_path: str, image_format: str = "png", quality: int = 85) -> str | None:
     """
     Genera una imagen de feedback con dos secciones a partir de un texto estructurado.
 
     :param text: El texto a renderizar en la imagen.
     :param output_path: La ruta donde se guardará la imagen generada.
+    :param image_format: El formato de salida, una de las claves de IMAGE_FORMATS.
+    :param quality: Calidad (1-100) para los formatos con pérdida.
     :return: La ruta al archivo de imagen si se generó correctamente, o None.
     """
     # --- Configuración de Estilo ---
@@ -27,25 +87,12 @@ def text_to_image(text: str, output_path: str) -> str | None:
     CORRECTED_TEXT_COLOR = "#000000"
     INCORRECT_WORD_BG = "#F34A07"  # Rojo (Nord)
     INCORRECT_WORD_TEXT = "#FFFFFF"
+    MISSING_WORD_BG = "#A3BE8C"  # Verde (Nord)
 
-    try:
-        # Intentar usar fuentes comunes en Linux (como en la Raspberry Pi)
-        font_regular = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", size=15)
-        font_bold = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", size=15)
-    except IOError:
-        try:
-            # Si falla, intentar con fuentes de Windows
-            font_regular = ImageFont.truetype("arial.ttf", size=15)
-            font_bold = ImageFont.truetype("arialbd.ttf", size=15)
-        except IOError:
-            # Como último recurso, usar la fuente por defecto (sin negritas)
-            print("Warning: Custom fonts not found. Falling back to default font.")
-            font_regular = ImageFont.load_default()
-            font_bold = ImageFont.load_default()
+    font_regular, font_bold = get_fonts()
 
     # 1. Parsear el texto del agente
-    original_sent = re.search(r'Original:\s*"(.*?)"', text, re.DOTALL)
-    corrected_sent = re.search(r'Corregido:\s*"(.*?)"', text, re.DOTALL)
+    original_sent_text, corrected_sent = extract_sentences(text)
     # La línea de feedback ahora es estática, no necesitamos parsearla.
     tip_line = re.search(r'Tip:\s*(.*)', text, re.DOTALL)
 
@@ -53,35 +100,25 @@ def text_to_image(text: str, output_path: str) -> str | None:
     # Si no hay errores, no existirá.
     has_correction = corrected_sent is not None
 
-    original_sent_text = original_sent.group(1) if original_sent else ""
-    corrected_sent_text = corrected_sent.group(1) if has_correction else ""
+    corrected_sent_text = corrected_sent if has_correction else ""
     tip_text = (tip_line.group(1) if tip_line else "").replace('\\n', '\n')
 
     # --- Dibujar la caja superior (Feedback) ---
+    # Es estática, así que se toma de la caché de plantillas en lugar de redibujarla.
     top_box_height = 80
-    top_img = Image.new('RGBA', (WIDTH, top_box_height), (0, 0, 0, 0))
-    top_draw = ImageDraw.Draw(top_img)
-    top_draw.rounded_rectangle(((0, 0), (WIDTH, top_box_height)), radius=CORNER_RADIUS, fill=TOP_BOX_BG)
-    
-    feedback_label = "Feedback"
-    label_width = top_draw.textlength(feedback_label, font=font_bold)
-    top_draw.text(((WIDTH - label_width) / 2, (top_box_height - font_bold.getbbox(feedback_label)[3]) / 2), feedback_label, font=font_bold, fill=FEEDBACK_TEXT_COLOR)
+    top_img = render_label_box(WIDTH, top_box_height, CORNER_RADIUS, TOP_BOX_BG, "Feedback", FEEDBACK_TEXT_COLOR)
 
     # --- Dibujar la caja inferior (Corrección) ---
     words_to_draw = []
     if has_correction:
-        # Encontrar las diferencias entre la frase original y la corregida
-        diff = ndiff(original_sent_text.split(), corrected_sent_text.split())
-        for item in diff:
-            code = item[0]
-            word = item[2:]
-            if code == ' ': # La palabra es correcta y está en ambas
-                words_to_draw.append({'text': word, 'type': 'correct'})
-            elif code == '-': # La palabra fue eliminada (incorrecta)
-                words_to_draw.append({'text': word, 'type': 'incorrect'})
-            elif code == '+': # La palabra fue añadida (parte de la corrección)
-                # No la dibujamos como una palabra separada, es parte de la frase final
-                pass
+        # Alinear palabra por palabra la frase original con la corregida
+        for op in align_words(original_sent_text, corrected_sent_text):
+            if op.kind == KEEP: # La palabra es correcta y está en ambas
+                words_to_draw.append({'text': op.original, 'type': 'correct'})
+            elif op.kind == INSERT: # Faltaba una palabra: la mostramos resaltada en verde
+                words_to_draw.append({'text': op.corrected, 'type': 'missing'})
+            else: # La palabra fue sustituida o sobraba (incorrecta)
+                words_to_draw.append({'text': op.original, 'type': 'incorrect'})
     else:
         # Si no hay corrección, todas las palabras son correctas.
         words_to_draw = [{'text': word, 'type': 'correct'} for word in original_sent_text.split()]
@@ -118,12 +155,13 @@ def text_to_image(text: str, output_path: str) -> str | None:
             x = PADDING
             y += line_height
 
-        if word_info['type'] == 'incorrect':
-            # Dibujar un fondo rojo para la palabra incorrecta
+        if word_info['type'] in ('incorrect', 'missing'):
+            # Dibujar un fondo rojo (incorrecta) o verde (faltante) para la palabra
             bbox = bottom_draw.textbbox((x, y), word, font=word_font)
             # Añadimos un pequeño margen al fondo
             bbox = (bbox[0] - 5, bbox[1] - 2, bbox[2] + 5, bbox[3] + 2)
-            bottom_draw.rectangle(bbox, fill=INCORRECT_WORD_BG)
+            word_bg = INCORRECT_WORD_BG if word_info['type'] == 'incorrect' else MISSING_WORD_BG
+            bottom_draw.rectangle(bbox, fill=word_bg)
             bottom_draw.text((x, y), word, font=word_font, fill=INCORRECT_WORD_TEXT)
         else:
             bottom_draw.text((x, y), word, font=word_font, fill=CORRECTED_TEXT_COLOR)
@@ -179,15 +217,17 @@ def text_to_image(text: str, output_path: str) -> str | None:
 
     # Convertir a RGB antes de guardar como JPEG/PNG si es necesario
     final_img_rgb = final_img.convert('RGB')
-    final_img_rgb.save(output_path)
+    save_image(final_img_rgb, output_path, image_format, quality)
     return output_path
 
-def text_to_simple_image(text: str, output_path: str) -> str | None:
+def text_to_simple_image(text: str, output_path: str, image_format: str = "png", quality: int = 85) -> str | None:
     """
     Genera una imagen simple con un texto, ideal para mostrar la respuesta del bot.
 
     :param text: El texto a renderizar en la imagen.
     :param output_path: La ruta donde se guardará la imagen generada.
+    :param image_format: El formato de salida, una de las claves de IMAGE_FORMATS.
+    :param quality: Calidad (1-100) para los formatos con pérdida.
     :return: La ruta al archivo de imagen si se generó correctamente, o None.
     """
     # --- Configuración de Estilo ---
@@ -196,16 +236,7 @@ def text_to_simple_image(text: str, output_path: str) -> str | None:
     BG_COLOR = "#FFFBEA" # Amarillo muy claro
     TEXT_COLOR = "#000000"
 
-    try:
-        # Intentar usar fuentes comunes en Linux
-        font_regular = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", size=15)
-    except IOError:
-        try:
-            # Si falla, intentar con fuentes de Windows
-            font_regular = ImageFont.truetype("arial.ttf", size=15)
-        except IOError:
-            # Como último recurso, usar la fuente por defecto
-            font_regular = ImageFont.load_default()
+    font_regular, _ = get_fonts()
 
     # Usamos un ancho menor para que el bloque de texto sea más angosto y centrado.
     response_lines = textwrap.wrap(text, width=40)
@@ -231,5 +262,5 @@ def text_to_simple_image(text: str, output_path: str) -> str | None:
         draw.text((x_start, y), line, font=font_regular, fill=TEXT_COLOR)
         y += line_height
     
-    final_img.save(output_path)
+    save_image(final_img, output_path, image_format, quality)
     return output_path
\ No newline at end of file
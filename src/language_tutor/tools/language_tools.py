@@ -2,6 +2,7 @@ import os
 import logging
 from openai import OpenAI
 from ..config import settings
+from .formats import SPEECH_FORMATS
 
 # Configura un logger básico
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
@@ -38,11 +39,12 @@ def transcribe_audio(file_path: str) -> str:
 # Configura un logger básico
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 
-def text_to_speech(text: str) -> str:
+def text_to_speech(text: str, response_format: str = "mp3") -> str:
     """
     Convierte texto a voz usando la API de OpenAI y guarda el archivo.
     
     :param text: El texto a convertir en voz.
+    :param response_format: El formato de audio, una de las claves de SPEECH_FORMATS.
     :return: La ruta al archivo de audio generado o un mensaje de error.
     """
     logging.info(f"Iniciando síntesis de voz para el texto: '{text}'...")
@@ -81,11 +83,13 @@ def text_to_speech(text: str) -> str:
             model="tts-1-hd", # Usamos el modelo de alta definición para mayor calidad.
             voice="alloy", 
             input=processed_text,
-            speed=0.80  # Reducimos la velocidad a 80% para una dicción muy clara y pausada.
+            speed=0.80,  # Reducimos la velocidad a 80% para una dicción muy clara y pausada.
+            response_format=response_format,
         )
         
         # Guardar la respuesta de audio directamente en un archivo
-        filename = os.path.join("data", ".uploads", f"response_{os.urandom(4).hex()}.mp3")
+        extension = SPEECH_FORMATS[response_format][1]
+        filename = os.path.join("data", ".uploads", f"response_{os.urandom(4).hex()}{extension}")
         response.stream_to_file(filename)
         
         logging.info(f"Archivo de audio guardado como '{filename}'.")
@@ -0,0 +1,198 @@
+import re
+import unicodedata
+from dataclasses import dataclass, asdict
+from difflib import SequenceMatcher
+
+# Tipos de operación de edición a nivel de palabra
+KEEP = "keep"
+SUBSTITUTE = "substitute"
+INSERT = "insert"
+DELETE = "delete"
+
+# Por debajo de este número de celdas se usa la matriz completa en lugar de
+# seguir dividiendo; el espacio sigue acotado por una constante.
+_SMALL_DP_CELLS = 4096
+# Por encima de este número de celdas se anclan primero los bloques idénticos.
+# Por debajo, Hirschberg sobre las frases completas es rápido y da siempre la
+# alineación mínima (las anclas voraces pueden no darla: "park park" -> "to park").
+_ANCHOR_MIN_CELLS = 40_000
+
+@dataclass(frozen=True)
+class Token:
+    """Una palabra del texto con su posición en caracteres y su forma normalizada."""
+    text: str
+    start: int
+    end: int
+    key: str
+
+@dataclass(frozen=True)
+class EditOp:
+    """
+    Una operación de edición entre la frase original y la corregida.
+
+    Los spans son (inicio, fin) en caracteres. En una inserción el span original
+    tiene longitud cero y marca dónde falta la palabra; en un borrado ocurre lo
+    mismo con el span corregido.
+    """
+    kind: str
+    original: str
+    corrected: str
+    original_span: tuple[int, int]
+    corrected_span: tuple[int, int]
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+def normalize_word(word: str) -> str:
+    """
+    Normaliza una palabra para compararla: minúsculas y sin signos de puntuación.
+    """
+    return "".join(ch for ch in word.casefold() if not unicodedata.category(ch).startswith("P"))
+
+def tokenize(text: str) -> list[Token]:
+    """
+    Divide un texto en palabras conservando sus posiciones en caracteres.
+    """
+    return [Token(m.group(), m.start(), m.end(), normalize_word(m.group())) for m in re.finditer(r"\S+", text)]
+
+def extract_sentences(feedback_text: str) -> tuple[str, str | None]:
+    """
+    Extrae la frase original y la corregida del feedback generado por el agente.
+
+    :param feedback_text: El texto con las secciones 'Original:' y 'Corregido:'.
+    :return: Una tupla (original, corregido). 'corregido' es None si la sección no existe,
+             lo que el agente usa para indicar que no hubo errores.
+    """
+    original_match = re.search(r'Original:\s*"(.*?)"', feedback_text, re.DOTALL)
+    corrected_match = re.search(r'Corregido:\s*"(.*?)"', feedback_text, re.DOTALL)
+    original = original_match.group(1).strip() if original_match else ""
+    corrected = corrected_match.group(1).strip() if corrected_match else None
+    return original, corrected
+
+def align_words(original: str, corrected: str) -> list[EditOp]:
+    """
+    Alinea dos frases palabra por palabra.
+
+    Las frases normales se alinean enteras con el algoritmo de Hirschberg, que usa
+    espacio lineal y da el mínimo número de ediciones. En transcripciones largas
+    (más de _ANCHOR_MIN_CELLS pares de palabras) primero se anclan los bloques de
+    palabras idénticas con SequenceMatcher y solo cada hueco entre anclas se alinea
+    de forma óptima; las anclas se eligen de forma voraz, así que el total puede
+    tener alguna edición de más, a cambio de un coste casi lineal en la longitud.
+
+    :param original: La frase dicha por el usuario.
+    :param corrected: La frase corregida.
+    :return: La lista de operaciones en orden, cubriendo ambas frases completas.
+    """
+    a = tokenize(original)
+    b = tokenize(corrected)
+    a_keys = [t.key for t in a]
+    b_keys = [t.key for t in b]
+
+    pairs = []
+    if len(a) * len(b) <= _ANCHOR_MIN_CELLS:
+        _hirschberg(a_keys, b_keys, 0, len(a), 0, len(b), pairs)
+    else:
+        i = j = 0
+        # El último bloque es siempre (len(a), len(b), 0) y cierra el último hueco.
+        for block in SequenceMatcher(None, a_keys, b_keys, autojunk=False).get_matching_blocks():
+            _hirschberg(a_keys, b_keys, i, block.a, j, block.b, pairs)
+            pairs.extend((KEEP, block.a + k, block.b + k) for k in range(block.size))
+            i, j = block.a + block.size, block.b + block.size
+
+    return [_to_edit_op(kind, i, j, a, b, len(original), len(corrected)) for kind, i, j in pairs]
+
+def has_errors(ops: list[EditOp]) -> bool:
+    """Indica si la alineación contiene algún cambio además de palabras conservadas."""
+    return any(op.kind != KEEP for op in ops)
+
+def analyze_feedback(feedback_text: str) -> dict | None:
+    """
+    Analiza un feedback del agente y devuelve un resumen serializable a JSON.
+
+    :param feedback_text: El texto de feedback del agente.
+    :return: Un diccionario con 'original', 'corrected', 'has_errors' y 'operations',
+             o None si el texto no contiene una sección 'Original:'.
+    """
+    if "Original:" not in feedback_text:
+        return None
+    original, corrected = extract_sentences(feedback_text)
+    ops = align_words(original, corrected) if corrected is not None else []
+    return {
+        "original": original,
+        "corrected": corrected,
+        "has_errors": has_errors(ops),
+        "operations": [op.to_dict() for op in ops],
+    }
+
+def _to_edit_op(kind: str, i: int, j: int, a: list[Token], b: list[Token], a_len: int, b_len: int) -> EditOp:
+    # En inserciones/borrados 'i' o 'j' apuntan a la palabra siguiente del otro lado.
+    if kind == INSERT:
+        pos = a[i].start if i < len(a) else a_len
+        return EditOp(kind, "", b[j].text, (pos, pos), (b[j].start, b[j].end))
+    if kind == DELETE:
+        pos = b[j].start if j < len(b) else b_len
+        return EditOp(kind, a[i].text, "", (a[i].start, a[i].end), (pos, pos))
+    return EditOp(kind, a[i].text, b[j].text, (a[i].start, a[i].end), (b[j].start, b[j].end))
+
+def _last_row(a: list[str], b: list[str]) -> list[int]:
+    """Última fila de la matriz de Levenshtein entre 'a' y 'b' en espacio O(len(b))."""
+    prev = list(range(len(b) + 1))
+    for x in a:
+        cur = [prev[0] + 1]
+        for j, y in enumerate(b, 1):
+            cur.append(min(prev[j - 1] + (x != y), prev[j] + 1, cur[j - 1] + 1))
+        prev = cur
+    return prev
+
+def _hirschberg(a: list[str], b: list[str], i0: int, i1: int, j0: int, j1: int, out: list) -> None:
+    n, m = i1 - i0, j1 - j0
+    if n == 0:
+        out.extend((INSERT, i0, j) for j in range(j0, j1))
+        return
+    if m == 0:
+        out.extend((DELETE, i, j0) for i in range(i0, i1))
+        return
+    if n * m <= _SMALL_DP_CELLS or n == 1 or m == 1:
+        _full_dp(a, b, i0, i1, j0, j1, out)
+        return
+
+    mid = i0 + n // 2
+    forward = _last_row(a[i0:mid], b[j0:j1])
+    backward = _last_row(a[mid:i1][::-1], b[j0:j1][::-1])
+    split = min(range(m + 1), key=lambda k: forward[k] + backward[m - k])
+    _hirschberg(a, b, i0, mid, j0, j0 + split, out)
+    _hirschberg(a, b, mid, i1, j0 + split, j1, out)
+
+def _full_dp(a: list[str], b: list[str], i0: int, i1: int, j0: int, j1: int, out: list) -> None:
+    n, m = i1 - i0, j1 - j0
+    dist = [[0] * (m + 1) for _ in range(n + 1)]
+    for i in range(n + 1):
+        dist[i][0] = i
+    for j in range(m + 1):
+        dist[0][j] = j
+    for i in range(1, n + 1):
+        x = a[i0 + i - 1]
+        for j in range(1, m + 1):
+            dist[i][j] = min(dist[i - 1][j - 1] + (x != b[j0 + j - 1]), dist[i - 1][j] + 1, dist[i][j - 1] + 1)
+
+    # Reconstruir el camino desde la esquina final. Ante empates se prefiere
+    # conservar, luego insertar/borrar y por último sustituir, para que una
+    # palabra añadida no desplace a la sustitución ("buyed apple" -> "bought an apple").
+    path = []
+    i, j = n, m
+    while i > 0 or j > 0:
+        same = i > 0 and j > 0 and a[i0 + i - 1] == b[j0 + j - 1]
+        if same and dist[i][j] == dist[i - 1][j - 1]:
+            i, j = i - 1, j - 1
+            path.append((KEEP, i0 + i, j0 + j))
+        elif j > 0 and dist[i][j] == dist[i][j - 1] + 1:
+            j -= 1
+            path.append((INSERT, i0 + i, j0 + j))
+        elif i > 0 and dist[i][j] == dist[i - 1][j] + 1:
+            i -= 1
+            path.append((DELETE, i0 + i, j0 + j))
+        else:
+            i, j = i - 1, j - 1
+            path.append((SUBSTITUTE, i0 + i, j0 + j))
+    out.extend(reversed(path))
@@ -0,0 +1,51 @@
+import logging
+import threading
+import time
+
+# Estado del calentamiento del proceso. Si el calentamiento se hace en el proceso
+# maestro antes del fork (modo precarga), los workers heredan el estado ya listo.
+_ready = threading.Event()
+_lock = threading.Lock()
+_error: str | None = None
+
+def warmup() -> None:
+    """
+    Precarga la configuración, las fuentes y las dependencias pesadas (autogen,
+    openai, Pillow) para que la primera petición no pague su coste.
+
+    Es idempotente: las llamadas posteriores a un calentamiento exitoso no hacen nada.
+    """
+    global _error
+    with _lock:
+        if _ready.is_set():
+            return
+
+        start = time.perf_counter()
+        try:
+            from .config import get_settings
+            from .configs import load_config
+            from .tools.image_tools import get_fonts
+
+            get_settings()
+            load_config('team_configs.json')
+            load_config('agent_roles.json')
+            get_fonts()
+
+            # Importar 'main' arrastra autogen y openai, las dependencias más lentas.
+            from . import main  # noqa: F401
+        except Exception as e:
+            _error = f"{type(e).__name__}: {e}"
+            logging.error(f"Error durante el calentamiento: {_error}", exc_info=True)
+            return
+
+        _error = None
+        _ready.set()
+        logging.info(f"Calentamiento completado en {time.perf_counter() - start:.2f}s.")
+
+def is_ready() -> bool:
+    """Indica si el calentamiento del proceso terminó correctamente."""
+    return _ready.is_set()
+
+def warmup_error() -> str | None:
+    """Devuelve el último error de calentamiento, o None si no hubo."""
+    return _error
@@ -1,9 +1,10 @@
+import asyncio
 import httpx
 import logging
 import io
-from telegram import Update
+from collections import OrderedDict
+from telegram import Message, Update
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
-import re
 
 import sys
 import os
@@ -12,6 +13,7 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
 from language_tutor.config import settings
+from language_tutor.tools.text_alignment import analyze_feedback
 # Configura el logging
 logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
@@ -21,10 +23,153 @@ logger = logging.getLogger(__name__)
 # --- CONFIGURACIÓN ---
 # Lee la configuración desde el objeto centralizado
 TELEGRAM_TOKEN = settings.TELEGRAM_TOKEN
-AGENT_API_URL = "http://127.0.0.1:8000/process-audio/"
-IMAGE_API_URL = "http://127.0.0.1:8000/generate-image-from-text/"
-TTS_API_URL = "http://127.0.0.1:8000/synthesize-speech/"
-SIMPLE_IMAGE_API_URL = "http://127.0.0.1:8000/generate-simple-image/"
+API_BASE_URL = settings.API_BASE_URL.rstrip("/")
+AGENT_API_URL = f"{API_BASE_URL}/process-audio/"
+IMAGE_API_URL = f"{API_BASE_URL}/generate-image-from-text/"
+TTS_API_URL = f"{API_BASE_URL}/synthesize-speech/"
+SIMPLE_IMAGE_API_URL = f"{API_BASE_URL}/generate-simple-image/"
+# Opciones de salida para las imágenes: una paleta reduce mucho el tamaño a subir a Telegram
+IMAGE_OUTPUT_OPTIONS = {"format": settings.BOT_IMAGE_FORMAT, "quality": settings.BOT_IMAGE_QUALITY}
+# Formato del audio para reply_voice: OGG/Opus se muestra como nota de voz y pesa menos que MP3
+VOICE_OUTPUT_OPTIONS = {"format": settings.BOT_VOICE_FORMAT}
+# Número de mensajes recientes que se recuerdan para descartar actualizaciones repetidas
+DEDUP_CACHE_SIZE = 1000
+# Segundos que se espera a los turnos en curso al apagar el bot antes de cancelarlos
+SHUTDOWN_DRAIN_SECONDS = 60.0
+
+
+class ChatTurnScheduler:
+    """
+    Reparte los mensajes de voz en colas por chat para que unos pocos usuarios muy
+    activos no acaparen la API.
+
+    - Limita los turnos en curso por chat y en total. El semáforo global atiende en
+      orden de llegada, así que los chats se turnan en lugar de esperar a los más ruidosos.
+    - Descarta los mensajes ya recibidos (mismo chat y message_id), p. ej. cuando
+      Telegram vuelve a entregar una actualización.
+    - Si 'merge_window' es mayor que cero, las notas de voz de un chat que llegan
+      dentro de esa ventana se procesan juntas como un solo turno.
+    """
+    def __init__(self, process_turn, max_in_flight_per_chat: int = 1, max_in_flight: int = 8,
+                 merge_window: float = 0.0):
+        self.process_turn = process_turn
+        self.max_in_flight_per_chat = max_in_flight_per_chat
+        self.merge_window = merge_window
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._pending: dict[int, list[tuple[float, Message]]] = {}
+        self._workers: dict[int, int] = {}
+        self._seen = OrderedDict()
+        self._tasks = set()
+
+    def submit(self, message: Message) -> bool:
+        """
+        Encola un mensaje de voz en la cola de su chat.
+
+        :return: False si el mensaje ya se había recibido y se descarta.
+        """
+        key = (message.chat_id, message.message_id)
+        if key in self._seen:
+            return False
+        self._seen[key] = None
+        if len(self._seen) > DEDUP_CACHE_SIZE:
+            self._seen.popitem(last=False)
+
+        loop = asyncio.get_running_loop()
+        self._pending.setdefault(message.chat_id, []).append((loop.time(), message))
+        if self._workers.get(message.chat_id, 0) < self.max_in_flight_per_chat:
+            self._workers[message.chat_id] = self._workers.get(message.chat_id, 0) + 1
+            # Guardamos la referencia para que la tarea no sea recolectada.
+            task = asyncio.create_task(self._run_chat(message.chat_id))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def drain(self, timeout: float = SHUTDOWN_DRAIN_SECONDS) -> None:
+        """
+        Espera a que terminen los turnos en curso y los encolados; los que sigan
+        pendientes tras 'timeout' segundos se cancelan.
+        """
+        if not self._tasks:
+            return
+        _, still_running = await asyncio.wait(set(self._tasks), timeout=timeout)
+        for task in still_running:
+            task.cancel()
+        await asyncio.gather(*still_running, return_exceptions=True)
+
+    async def _run_chat(self, chat_id: int) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            while self._pending.get(chat_id):
+                if self.merge_window > 0:
+                    # Esperamos a que se cumpla la ventana desde la primera nota pendiente.
+                    first_arrival = self._pending[chat_id][0][0]
+                    delay = first_arrival + self.merge_window - loop.time()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    pending = self._pending.get(chat_id, [])
+                    if not pending or pending[0][0] != first_arrival:
+                        # Otro worker del chat se llevó esa nota; recalculamos la ventana.
+                        continue
+                    # Solo se unen las notas que llegaron dentro de la ventana de la primera;
+                    # las posteriores (p. ej. enviadas mientras se procesaba otro turno) esperan al siguiente.
+                    size = 0
+                    while size < len(pending) and pending[size][0] <= first_arrival + self.merge_window:
+                        size += 1
+                    batch, self._pending[chat_id] = pending[:size], pending[size:]
+                else:
+                    batch = [self._pending[chat_id].pop(0)]
+                if not batch:
+                    continue
+                async with self._slots:
+                    try:
+                        await self.process_turn([message for _, message in batch])
+                    except Exception as e:
+                        logger.error(f"Error en el turno del chat {chat_id}: {e}", exc_info=True)
+        finally:
+            self._workers[chat_id] -= 1
+            if not self._workers[chat_id]:
+                del self._workers[chat_id]
+                self._pending.pop(chat_id, None)
+
+
+# Cliente HTTP compartido por todos los turnos: reutiliza las conexiones con la API
+# en lugar de abrir un pool nuevo por cada nota de voz.
+_api_client: httpx.AsyncClient | None = None
+
+def get_api_client() -> httpx.AsyncClient:
+    """Devuelve el cliente HTTP compartido con la API, creándolo en el primer uso."""
+    global _api_client
+    if _api_client is None or _api_client.is_closed:
+        _api_client = httpx.AsyncClient(timeout=120.0)
+    return _api_client
+
+async def drain_scheduler(application: Application) -> None:
+    """
+    Termina los turnos de voz en curso al detener el bot (hook post_stop), antes de
+    que post_shutdown cierre el cliente HTTP que usan.
+    """
+    scheduler = application.bot_data.get("scheduler")
+    if scheduler is not None:
+        await scheduler.drain()
+
+async def close_api_client(application: Application) -> None:
+    """Cierra el cliente HTTP compartido al apagar el bot (hook post_shutdown)."""
+    if _api_client is not None:
+        await _api_client.aclose()
+
+
+def create_scheduler(max_in_flight: int | None = None) -> ChatTurnScheduler:
+    """
+    Crea el planificador de turnos con los límites de la configuración.
+
+    :param max_in_flight: Turnos en curso en total; por defecto BOT_MAX_IN_FLIGHT.
+    """
+    return ChatTurnScheduler(
+        process_voice_turn,
+        max_in_flight_per_chat=settings.BOT_MAX_IN_FLIGHT_PER_CHAT,
+        max_in_flight=max_in_flight or settings.BOT_MAX_IN_FLIGHT,
+        merge_window=settings.BOT_MERGE_WINDOW_SECONDS,
+    )
 
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -33,111 +178,178 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 
 
 async def handle_voice_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Procesa los mensajes de voz."""
+    """Recibe los mensajes de voz y los encola en el turno de su chat."""
     voice = update.message.voice
     if not voice:
         return
 
+    if "scheduler" not in context.bot_data:
+        context.bot_data["scheduler"] = create_scheduler()
+    if not context.bot_data["scheduler"].submit(update.message):
+        logger.info(f"Mensaje {update.message.message_id} repetido, se descarta.")
+        return
+
     await update.message.reply_text("Recibido. Procesando tu audio...")
 
+
+def voice_files(voice_notes: list[bytearray]) -> list[tuple]:
+    """Prepara las notas de voz como archivos del campo 'file' de la petición multipart."""
+    return [('file', (f'voice_message_{index}.ogg', io.BytesIO(note), 'audio/ogg')) for index, note in enumerate(voice_notes)]
+
+
+async def process_voice_turn(messages: list[Message]) -> None:
+    """
+    Procesa un turno de conversación: una nota de voz o varias seguidas del mismo chat.
+    Las respuestas se envían como réplica a la última nota.
+    """
+    message = messages[-1]
+
     try:
-        # Descarga el archivo de voz de Telegram
-        voice_file = await voice.get_file()
-        voice_bytearray = await voice_file.download_as_bytearray()
+        # Descarga las notas de voz de Telegram. Si el turno une varias, se envían como
+        # archivos separados y la API transcribe cada una.
+        voice_notes = []
+        for voice_message in messages:
+            voice_file = await voice_message.voice.get_file()
+            voice_notes.append(await voice_file.download_as_bytearray())
 
         # Prepara los datos para enviar a la API (multipart/form-data)
-        files = {'file': ('voice_message.ogg', io.BytesIO(voice_bytearray), 'audio/ogg')}
+        files = voice_files(voice_notes)
         
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            # --- PASO 1: Obtener el feedback ---
-            logger.info(f"Solicitando feedback a la API...")
-            feedback_response = await client.post(AGENT_API_URL, data={"team_name": "detailed_feedback_team"}, files=files)
-
-            if feedback_response.status_code == 200:
-                feedback_text = feedback_response.json().get("response")
-                if not feedback_text:
-                    await update.message.reply_text("No se pudo generar el feedback.")
-                    return
-
-                # Extraemos el texto original y el corregido para compararlos en Python
-                original_match = re.search(r'Original:\s*"(.*?)"', feedback_text, re.DOTALL)
-                corrected_match = re.search(r'Corregido:\s*"(.*?)"', feedback_text, re.DOTALL)
-
-                original_text = original_match.group(1).strip() if original_match else ""
-                corrected_text = corrected_match.group(1).strip() if corrected_match else ""
-
-                # --- PASO 2: Decidir el flujo basado en si hay errores ---
-                # La decisión se toma comparando los textos, no buscando la palabra "Corregido:"
-                if original_text.lower() != corrected_text.lower():
-                    # --- Flujo con errores: Feedback + Conversación ---
-                    logger.info("Se encontraron errores, enviando feedback detallado.")
-                    # 2a. Enviar la imagen de feedback
-                    image_response = await client.post(IMAGE_API_URL, json={"text": feedback_text})
-                    if image_response.status_code == 200:
-                        await update.message.reply_photo(photo=image_response.content)
-                    else:
-                        await update.message.reply_text(f"Error al generar imagen: {image_response.text}")
-
-                    # 2b. Enviar el audio del feedback
-                    tts_response = await client.post(TTS_API_URL, json={"text": feedback_text})
-                    if tts_response.status_code == 200:
-                        await update.message.reply_voice(voice=tts_response.content)
-                    else:
-                        await update.message.reply_text(f"Error al generar audio: {tts_response.text}")
-                else:
-                    # --- Flujo sin errores: Solo conversación ---
-                    logger.info("No se encontraron errores, continuando la conversación.")
+        client = get_api_client()
 
-            else:
-                await update.message.reply_text(f"Error al obtener feedback: {feedback_response.text}")
+        # --- PASO 1: Obtener el feedback ---
+        logger.info(f"Solicitando feedback a la API...")
+        feedback_response = await client.post(AGENT_API_URL, data={"team_name": "detailed_feedback_team"}, files=files)
+
+        if feedback_response.status_code == 200:
+            feedback_payload = feedback_response.json()
+            feedback_text = feedback_payload.get("response")
+            if not feedback_text:
+                await message.reply_text("No se pudo generar el feedback.")
                 return
 
-            # --- PASO 3: Obtener y enviar la respuesta conversacional (siempre se ejecuta) ---
-            # Reutilizamos el archivo de audio para una segunda llamada
-            files_for_conversation = {'file': ('voice_message.ogg', io.BytesIO(voice_bytearray), 'audio/ogg')}
-            logger.info(f"Solicitando continuación de la conversación a la API...")
-            conversation_response = await client.post(AGENT_API_URL, data={"team_name": "direct_conversation_team"}, files=files_for_conversation)
-
-            if conversation_response.status_code == 200:
-                conversation_text = conversation_response.json().get("response", "")
-                if not conversation_text:
-                    logger.warning("No se generó respuesta conversacional.")
-                    return
-
-                # 3a. Generar y enviar la imagen de la respuesta conversacional
-                simple_image_response = await client.post(SIMPLE_IMAGE_API_URL, json={"text": conversation_text})
-                if simple_image_response.status_code == 200:
-                    await update.message.reply_photo(photo=simple_image_response.content)
+            # La API ya adjunta la alineación entre la frase original y la corregida;
+            # si no viene (p. ej. una API antigua), la calculamos aquí con el mismo módulo.
+            corrections = feedback_payload.get("corrections") or analyze_feedback(feedback_text)
+
+            # --- PASO 2: Decidir el flujo basado en si hay errores ---
+            # La decisión se toma alineando las frases palabra por palabra (sin distinguir
+            # mayúsculas ni puntuación), no buscando la palabra "Corregido:"
+            if corrections and corrections["has_errors"]:
+                # --- Flujo con errores: Feedback + Conversación ---
+                logger.info("Se encontraron errores, enviando feedback detallado.")
+                # 2a. Enviar la imagen de feedback
+                image_response = await client.post(IMAGE_API_URL, json={"text": feedback_text, **IMAGE_OUTPUT_OPTIONS})
+                if image_response.status_code == 200:
+                    await message.reply_photo(photo=image_response.content)
                 else:
-                    await update.message.reply_text(f"Error al generar imagen de respuesta: {simple_image_response.text}")
+                    await message.reply_text(f"Error al generar imagen: {image_response.text}")
 
-                # 3b. Generar y enviar el audio de la respuesta conversacional
-                tts_response_conv = await client.post(TTS_API_URL, json={"text": conversation_text})
-                if tts_response_conv.status_code == 200:
-                    await update.message.reply_voice(voice=tts_response_conv.content)
+                # 2b. Enviar el audio del feedback
+                tts_response = await client.post(TTS_API_URL, json={"text": feedback_text, **VOICE_OUTPUT_OPTIONS})
+                if tts_response.status_code == 200:
+                    await message.reply_voice(voice=tts_response.content)
                 else:
-                    await update.message.reply_text(f"Error al generar audio de respuesta: {tts_response_conv.text}")
+                    await message.reply_text(f"Error al generar audio: {tts_response.text}")
+            else:
+                # --- Flujo sin errores: Solo conversación ---
+                logger.info("No se encontraron errores, continuando la conversación.")
 
+        else:
+            await message.reply_text(f"Error al obtener feedback: {feedback_response.text}")
+            return
+
+        # --- PASO 3: Obtener y enviar la respuesta conversacional (siempre se ejecuta) ---
+        # Reutilizamos el archivo de audio para una segunda llamada
+        files_for_conversation = voice_files(voice_notes)
+        logger.info(f"Solicitando continuación de la conversación a la API...")
+        conversation_response = await client.post(AGENT_API_URL, data={"team_name": "direct_conversation_team"}, files=files_for_conversation)
+
+        if conversation_response.status_code == 200:
+            conversation_text = conversation_response.json().get("response", "")
+            if not conversation_text:
+                logger.warning("No se generó respuesta conversacional.")
+                return
+
+            # 3a. Generar y enviar la imagen de la respuesta conversacional
+            simple_image_response = await client.post(SIMPLE_IMAGE_API_URL, json={"text": conversation_text, **IMAGE_OUTPUT_OPTIONS})
+            if simple_image_response.status_code == 200:
+                await message.reply_photo(photo=simple_image_response.content)
             else:
-                await update.message.reply_text(f"Error al continuar la conversación: {conversation_response.text}")
+                await message.reply_text(f"Error al generar imagen de respuesta: {simple_image_response.text}")
+
+            # 3b. Generar y enviar el audio de la respuesta conversacional
+            tts_response_conv = await client.post(TTS_API_URL, json={"text": conversation_text, **VOICE_OUTPUT_OPTIONS})
+            if tts_response_conv.status_code == 200:
+                await message.reply_voice(voice=tts_response_conv.content)
+            else:
+                await message.reply_text(f"Error al generar audio de respuesta: {tts_response_conv.text}")
+
+        else:
+            await message.reply_text(f"Error al continuar la conversación: {conversation_response.text}")
 
     except Exception as e:
         logger.error(f"Error al procesar el mensaje de voz: {e}", exc_info=True)
-        await update.message.reply_text("Lo siento, un error inesperado ocurrió.")
+        await message.reply_text("Lo siento, un error inesperado ocurrió.")
+
+
+def build_application(token: str) -> Application:
+    """
+    Crea la Application del bot con sus handlers.
+
+    Los handlers se ejecutan en paralelo hasta BOT_CONCURRENT_UPDATES, pero el de voz
+    solo encola la nota y envía el acuse de recibo: el procesamiento real de los turnos
+    lo hace ChatTurnScheduler y su límite es BOT_MAX_IN_FLIGHT (BOT_MAX_IN_FLIGHT_PER_CHAT
+    por chat). El pool de conexiones con Telegram se dimensiona para ambos.
+    """
+    application = (
+        Application.builder()
+        .token(token)
+        .concurrent_updates(settings.BOT_CONCURRENT_UPDATES)
+        .connection_pool_size(settings.BOT_CONNECTION_POOL_SIZE)
+        .post_stop(drain_scheduler)
+        .post_shutdown(close_api_client)
+        .build()
+    )
+    application.add_handler(CommandHandler("start", start))
+    application.add_handler(MessageHandler(filters.VOICE, handle_voice_message))
+    return application
 
 
 def main() -> None:
-    """Inicia el bot de Telegram."""
+    """
+    Inicia el bot de Telegram en modo polling (por defecto) o webhook.
+
+    En modo webhook (BOT_MODE=webhook) el bot escucha HTTP en BOT_WEBHOOK_LISTEN:BOT_WEBHOOK_PORT
+    y un proxy inverso local con HTTPS (p. ej. Caddy o nginx) le reenvía las peticiones
+    que Telegram envía a BOT_WEBHOOK_URL, la URL pública completa terminada en BOT_WEBHOOK_PATH.
+    El servidor del webhook corre en el mismo bucle de eventos que los handlers.
+    """
     if not TELEGRAM_TOKEN:
         print("Error: La variable TELEGRAM_TOKEN no está configurada en tu archivo .env.")
         return
 
-    application = Application.builder().token(TELEGRAM_TOKEN).build()
-    application.add_handler(CommandHandler("start", start))
-    application.add_handler(MessageHandler(filters.VOICE, handle_voice_message))
+    application = build_application(TELEGRAM_TOKEN)
 
-    print("Iniciando bot de Telegram... Presiona Ctrl+C para detener.")
-    application.run_polling()
+    if settings.BOT_MODE == "webhook":
+        if not settings.BOT_WEBHOOK_URL:
+            print("Error: BOT_MODE es 'webhook' pero BOT_WEBHOOK_URL no está configurada en tu archivo .env.")
+            return
+        print(f"Iniciando bot de Telegram en modo webhook en {settings.BOT_WEBHOOK_LISTEN}:{settings.BOT_WEBHOOK_PORT}... Presiona Ctrl+C para detener.")
+        application.run_webhook(
+            listen=settings.BOT_WEBHOOK_LISTEN,
+            port=settings.BOT_WEBHOOK_PORT,
+            url_path=settings.BOT_WEBHOOK_PATH,
+            webhook_url=settings.BOT_WEBHOOK_URL,
+            secret_token=settings.BOT_WEBHOOK_SECRET,
+            # Telegram admite entre 1 y 100 conexiones; los turnos los limita BOT_MAX_IN_FLIGHT.
+            max_connections=max(1, min(settings.BOT_MAX_IN_FLIGHT, 100)),
+        )
+    elif settings.BOT_MODE == "polling":
+        print("Iniciando bot de Telegram... Presiona Ctrl+C para detener.")
+        application.run_polling()
+    else:
+        print(f"Error: Modo de bot no soportado: '{settings.BOT_MODE}'. Opciones válidas: 'polling', 'webhook'.")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,57 @@
+import random
+from language_tutor.tools.text_alignment import (
+    DELETE, INSERT, KEEP, SUBSTITUTE, EditOp, _last_row, align_words, analyze_feedback, tokenize
+)
+
+def kinds(ops: list[EditOp]) -> list[str]:
+    return [op.kind for op in ops]
+
+def test_insert_does_not_displace_substitution():
+    ops = align_words("buyed apple", "bought an apple")
+    assert kinds(ops) == [SUBSTITUTE, INSERT, KEEP]
+    assert ops[0] == EditOp(SUBSTITUTE, "buyed", "bought", (0, 5), (0, 6))
+    # La palabra que falta se marca justo antes de "apple" en la frase original
+    assert ops[1] == EditOp(INSERT, "", "an", (6, 6), (7, 9))
+    assert ops[2] == EditOp(KEEP, "apple", "apple", (6, 11), (10, 15))
+
+def test_case_and_punctuation_are_ignored():
+    ops = align_words("Yesterday I go home.", "yesterday, I went home")
+    assert kinds(ops) == [KEEP, KEEP, SUBSTITUTE, KEEP]
+    # Los spans apuntan al texto tal cual, con su puntuación
+    assert ops[0].original == "Yesterday" and ops[0].corrected == "yesterday,"
+    assert ops[3].original_span == (15, 20)
+
+def test_delete_marks_position_in_corrected():
+    ops = align_words("I am agree", "I agree")
+    assert kinds(ops) == [KEEP, DELETE, KEEP]
+    assert ops[1] == EditOp(DELETE, "am", "", (2, 4), (2, 2))
+
+def test_empty_inputs():
+    assert align_words("", "") == []
+    assert kinds(align_words("", "Hello world")) == [INSERT, INSERT]
+    assert align_words("", "Hello world")[1].original_span == (0, 0)
+    assert kinds(align_words("Hi there", "")) == [DELETE, DELETE]
+    assert align_words("Hi there", "")[1].corrected_span == (0, 0)
+
+def test_short_inputs_are_minimal():
+    # Con anclas voraces "park park" -> "to park" salía con 2 ediciones en lugar de 1
+    assert kinds(align_words("park park", "to park")) == [SUBSTITUTE, KEEP]
+
+    rng = random.Random(0)
+    words = "to park the a an go went is are".split()
+    for _ in range(500):
+        original = " ".join(rng.choices(words, k=rng.randint(0, 10)))
+        corrected = " ".join(rng.choices(words, k=rng.randint(0, 10)))
+        ops = align_words(original, corrected)
+        expected = _last_row([t.key for t in tokenize(original)], [t.key for t in tokenize(corrected)])[-1]
+        assert sum(op.kind != KEEP for op in ops) == expected
+
+def test_analyze_feedback():
+    feedback = 'Original: "I buyed apple"\n\nCorregido: "I bought an apple"\n\nTip: ...'
+    result = analyze_feedback(feedback)
+    assert result["has_errors"] is True
+    assert [op["kind"] for op in result["operations"]] == [KEEP, SUBSTITUTE, INSERT, KEEP]
+
+    no_errors = analyze_feedback('Original: "I bought an apple"\nTERMINATE')
+    assert no_errors == {"original": "I bought an apple", "corrected": None, "has_errors": False, "operations": []}
+    assert analyze_feedback("That sounds great!") is None